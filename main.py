@@ -8,6 +8,7 @@ Error page content stored as error.html in WWW_DIR.
 
 Each update creates new Snapshot based on `checksum` field of the response.
 Expired content is being moved into a Snapshot directory inside BIN_DIR
+API response ETag / Last-Modified are kept in Meta to skip unchanged content with conditional requests.
 
 To run the script set NRTK_API_URL and NRTK_API_TOKEN environment variables.
 
@@ -28,26 +29,59 @@ __author__ = 'Mikhail Ageev'
 
 
 import argparse
+import base64
+import concurrent.futures
 import datetime as dt
+import errno
 import hashlib
+import http.client
 import json
 import logging
 import os
+import shutil
+import threading
 import time
+import urllib.parse
 import urllib.request
-import urllib.error
+import xml.sax.saxutils
 
 
 APP_DIR = '.nrtk'               # App directory to store Meta and content snapshots
 WWW_DIR = 'www/'                # Directory to store content files
 BIN_DIR = 'bin/'                # Snapshots (Bin) directory name
 META_FILE_NAME = 'meta.json'    # Instance Meta information
+SITEMAP_FILE_NAME = 'sitemap.xml'       # Sitemap file name in WWW_DIR
+ERROR_PAGE_FILE_NAME = 'error.html'     # Error page file name in WWW_DIR
 LOG_FILE_NAME = 'sync.log'      # Log file name
 MIN_SYNC_CYCLE = 60             # Minimal sync cycle pause in Infinity mode
+STORY_WRITE_WORKERS = 8         # Number of threads writing story files
+RESPONSE_CHUNK_SIZE = 1 << 16   # API response read chunk size in bytes
 
 BASE_PATH = os.path.dirname(__file__)
 APP_PATH = os.path.join(BASE_PATH, APP_DIR)
 
+THEME_REQUIRED_FIELDS = frozenset(('homepage_url', 'stories', 'error_page', 'entity', 'title',))
+STORY_REQUIRED_FIELDS = frozenset(('canonical_url', 'content', 'anchor', 'updated_at', 'title',
+                                   'is_landing', 'hash', 'uid', 'credits',))
+
+SITEMAP_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                  '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+                  'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                  'xsi:schemaLocation="http://www.sitemaps.org/schemas/sitemap/0.9 '
+                  'http://www.sitemaps.org/schemas/sitemap/0.9/sitemap.xsd">\n'
+                  '<!-- Created by Newsroom Toolkit www.newsroomtoolkit.com -->\n')
+SITEMAP_FOOTER = '\n</urlset>'
+
+NRTK_API_URL = os.getenv('NRTK_API_URL', None)
+NRTK_API_TOKEN = os.getenv('NRTK_API_TOKEN', None)
+
+HARDLINK_UNSUPPORTED_ERRORS = (errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EMLINK)
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 10              # Same limit as urllib redirect handler
+
+NOT_MODIFIED = object()         # Fetch result when API content has not changed since the last sync
+
 
 def check_dir(dir_path=None):
     """Checks if the directory exists otherwise creates it
@@ -62,15 +96,153 @@ def check_dir(dir_path=None):
                 os.mkdir(dir_path)
                 return True
             except OSError as exc:
-                logger.error(f"Unable to create app dirs at {dir_path}: {exc}")
+                logger.error("Unable to create app dirs at %s: %s", dir_path, exc)
                 exit()
         else:
-            logger.debug(f"Directory exists {dir_path}")
+            logger.debug("Directory exists %s", dir_path)
             return True
 
     return False
 
 
+def open_connection(url_parts):
+    """Creates HTTP(S) connection for the URL honouring proxy environment variables like urllib.
+    HTTPS is tunneled through the proxy with CONNECT, plain HTTP requests are forwarded to it.
+    Returns connection and headers to add to forwarded requests (None when not forwarded).
+
+    :param url_parts: Requested URL parts
+    :type url_parts: urllib.parse.SplitResult
+    """
+
+    connection_class = http.client.HTTPSConnection if url_parts.scheme == 'https' else http.client.HTTPConnection
+
+    proxy_url = urllib.request.getproxies().get(url_parts.scheme)
+    if not proxy_url or urllib.request.proxy_bypass(url_parts.netloc):
+        return connection_class(url_parts.netloc, timeout=20), None
+
+    if '://' not in proxy_url:
+        proxy_url = f"http://{proxy_url}"
+    proxy_url_parts = urllib.parse.urlsplit(proxy_url)
+
+    proxy_headers = {}
+    if proxy_url_parts.username:
+        credentials = f"{urllib.parse.unquote(proxy_url_parts.username)}:" \
+                      f"{urllib.parse.unquote(proxy_url_parts.password or '')}"
+        proxy_headers["Proxy-Authorization"] = f"Basic {base64.b64encode(credentials.encode('utf-8')).decode('ascii')}"
+
+    connection = connection_class(proxy_url_parts.hostname, proxy_url_parts.port, timeout=20)
+
+    if url_parts.scheme == 'https':
+        connection.set_tunnel(url_parts.hostname, url_parts.port, headers=proxy_headers)
+        return connection, None
+
+    return connection, proxy_headers
+
+
+def request_target(url_parts, forwarded=False):
+    """Returns request target for the URL: absolute URL when forwarded through HTTP proxy, path otherwise.
+
+    :param url_parts: Requested URL parts
+    :type url_parts: urllib.parse.SplitResult
+    :param forwarded: Request is forwarded through HTTP proxy
+    :type forwarded: bool
+    """
+
+    if forwarded:
+        return urllib.parse.urlunsplit(url_parts._replace(path=url_parts.path or '/', fragment=''))
+
+    path = url_parts.path or '/'
+    if url_parts.query:
+        path = f"{path}?{url_parts.query}"
+
+    return path
+
+
+def read_response(response):
+    """Reads response body chunk by chunk hashing it while data arrives.
+    Returns response body and its SHA-256 checksum.
+
+    :param response: http.client.HTTPResponse instance
+    :type response: object
+    """
+
+    content = bytearray()
+    checksum = hashlib.sha256()
+
+    while chunk := response.read(RESPONSE_CHUNK_SIZE):
+        checksum.update(chunk)
+        content += chunk
+
+    return content, checksum.hexdigest()
+
+
+def snapshot_file(file_path, file_bin_path):
+    """Keeps current version of the file in Bin with a hardlink (no data copy).
+    Falls back to copying when hardlinks are not supported.
+    Existing Snapshot files are never overwritten.
+
+    :param file_path: File absolute path
+    :type file_path: str
+    :param file_bin_path: File path inside Snapshot directory
+    :type file_bin_path: str
+    """
+
+    try:
+        os.link(file_path, file_bin_path)
+
+    except FileExistsError:
+        logger.warning("Snapshot file already exists, keeping it > %s", file_bin_path)
+        return False
+
+    except OSError as exc:
+        if exc.errno not in HARDLINK_UNSUPPORTED_ERRORS:
+            raise
+        shutil.copy2(file_path, file_bin_path)
+
+    return True
+
+
+def replace_file(file_path, content):
+    """Atomically replaces file content writing it into a temporary file first.
+    Temporary file name is unique per process and thread and is removed if writing fails.
+    Hardlinked Snapshot copies of the old file stay untouched.
+
+    :param file_path: File absolute path
+    :type file_path: str
+    :param content: New file content
+    :type content: bytes
+    """
+
+    dir_path, file_name = os.path.split(file_path)
+    tmp_file_path = os.path.join(dir_path, f".{file_name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    try:
+        with open(tmp_file_path, "wb") as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_file_path, file_path)
+
+    except BaseException:
+        try:
+            os.remove(tmp_file_path)
+        except OSError:
+            pass
+        raise
+
+
+def create_sitemap_item(url=None, updated_at=None, priority=0.8):
+    """Create sitemap page item. URL is XML-escaped.
+
+    :param url: URL for the page.
+    :type url: str
+    :param updated_at: Latest update date and time.
+    :type updated_at: str
+    :param priority: Priority.
+    :priority: float
+    """
+
+    return f'<url><loc>{xml.sax.saxutils.escape(url)}</loc><lastmod>{updated_at[0:19]}+00:00</lastmod><priority>{priority}</priority></url>'
+
+
 class NRTKSync(object):
 
     bin_path = None
@@ -78,6 +250,9 @@ class NRTKSync(object):
     meta_filepath = None
     meta_file_content = None    # Offline instance Meta
     meta_object = None          # Instance new Meta data
+    checksum = None             # API response body checksum
+    etag = None                 # API response validators for conditional requests
+    last_modified = None
 
     story_dictonary = {}
 
@@ -85,13 +260,18 @@ class NRTKSync(object):
 
         logger.info("Starting Update")
 
-        if not os.getenv('NRTK_API_URL', None) or not os.getenv('NRTK_API_TOKEN', None):
+        if not NRTK_API_URL or not NRTK_API_TOKEN:
             logger.error("Unable to get API URL & Token")
             exit()
 
         else:
-            self.api_url = os.getenv('NRTK_API_URL')
-            self.api_token = os.getenv('NRTK_API_TOKEN')
+            self.api_url = NRTK_API_URL
+            self.api_token = NRTK_API_TOKEN
+
+        self.api_url_parts = urllib.parse.urlsplit(self.api_url)
+        self.api_headers = {"Authorization": f"Token {self.api_token}"}
+        self.connection = None
+        self.connection_proxy_headers = None
 
         self.bin_root_path = os.path.join(APP_PATH, BIN_DIR)
         self.www_path = os.path.join(BASE_PATH, WWW_DIR)
@@ -99,23 +279,28 @@ class NRTKSync(object):
         check_dir(self.bin_root_path)
         check_dir(self.www_path)
 
+        self.sitemap_path = os.path.join(self.www_path, SITEMAP_FILE_NAME)
+        self.error_page_path = os.path.join(self.www_path, ERROR_PAGE_FILE_NAME)
+
         self.meta_filepath = os.path.join(APP_PATH, META_FILE_NAME)
+        self.meta_file_content = self.read_meta()
 
     def read_meta(self) -> dict:
         """Reads local Meta file if exists."""
 
         if os.path.isfile(self.meta_filepath):
-            with open(self.meta_filepath, "r") as meta_file:
-                try:
-                    return json.load(meta_file)
-                except OSError as exc:
-                    logger.warning(f"Unable to read local Meta file at {self.meta_filepath}: {exc}")
-                    return None
+            try:
+                with open(self.meta_filepath, "rb") as meta_file:
+                    return json.loads(meta_file.read())
+            except (OSError, ValueError) as exc:
+                logger.warning("Unable to read local Meta file at %s: %s", self.meta_filepath, exc)
+                return None
         else:
-            logger.warning(f"Meta file is not found at {self.meta_filepath}")
+            logger.warning("Meta file is not found at %s", self.meta_filepath)
             return None
 
     def save_meta(self):
+        """Saves new Meta data into local Meta file and keeps it as the current offline Meta."""
 
         logger.info("Updating local Meta file")
 
@@ -123,35 +308,24 @@ class NRTKSync(object):
 
             if self.bin_path and os.path.isfile(self.meta_filepath):
                 meta_bin_path = os.path.join(self.bin_path, META_FILE_NAME)
-                logger.warning(f"Moving old Meta into Bin > {meta_bin_path}")
-                os.rename(self.meta_filepath, meta_bin_path)
+                logger.warning("Keeping old Meta in Bin > %s", meta_bin_path)
+                snapshot_file(self.meta_filepath, meta_bin_path)
 
-            with open(self.meta_filepath, "w") as meta_file:
-                try:
-                    json.dump(self.meta_object, meta_file)
-                    return True
+            try:
+                meta_content = json.dumps(self.meta_object, separators=(',', ':')).encode("utf-8")
 
-                except ValueError:
-                    logger.error("Meta config bad format")
-                    logger.error(self.meta_object)
-                    return False
+            except ValueError:
+                logger.error("Meta config bad format")
+                logger.error(self.meta_object)
+                return False
+
+            replace_file(self.meta_filepath, meta_content)
+            self.meta_file_content = self.meta_object
+            return True
 
         logger.warning('Meta config is empty')
         return False
 
-    def create_sitemap_item(self, url=None, updated_at=None, priority=0.8):
-        """Create sitemap page item.
-
-        :param url: URL for the page.
-        :type url: str
-        :param updated_at: Latest update date and time.
-        :type updated_at: str
-        :param priority: Priority.
-        :priority: float
-        """
-
-        return f'<url><loc>{url}</loc><lastmod>{updated_at[0:19]}+00:00</lastmod><priority>{priority}</priority></url>'
-
     def build_sitemap(self, sitemap_items=""):
         """Generates and saves sitemap.xml content for the snapshot
 
@@ -161,17 +335,9 @@ class NRTKSync(object):
 
         logger.info("Generating Sitemap")
 
-        sitemap_content = f"""<?xml version="1.0" encoding="UTF-8"?>
-            <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" 
-            xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" 
-            xsi:schemaLocation="http://www.sitemaps.org/schemas/sitemap/0.9 
-            http://www.sitemaps.org/schemas/sitemap/0.9/sitemap.xsd">
-            <!-- Created by Newsroom Toolkit www.newsroomtoolkit.com -->
-                {sitemap_items}
-            </urlset>"""
+        sitemap_content = "".join((SITEMAP_HEADER, sitemap_items, SITEMAP_FOOTER))
 
-        with open(f"{self.www_path}/sitemap.xml", "w") as sitemap_file:
-            sitemap_file.write(sitemap_content)
+        replace_file(self.sitemap_path, sitemap_content.encode("utf-8"))
 
     def save_error_page(self):
 
@@ -179,147 +345,299 @@ class NRTKSync(object):
 
             try:
                 logger.info("Creating Error page")
-                with open(f"{self.www_path}/error.html", "w") as error_page_file:
-                    error_page_file.write(self.remote_data['error_page'])
+                replace_file(self.error_page_path, self.remote_data['error_page'].encode("utf-8"))
                 return True
 
             except OSError as exc:
-                logger.warning(f"Unable to save Error page content: {exc}")
+                logger.warning("Unable to save Error page content: %s", exc)
                 return False
 
         logger.warning("No content for Error page")
         return False
 
+    def get_connection(self):
+        """Returns persistent API connection (HTTP keep-alive) creating it if needed."""
+
+        if self.connection is None:
+            self.connection, self.connection_proxy_headers = open_connection(self.api_url_parts)
+
+        return self.connection
+
+    def close_connection(self):
+
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+            self.connection_proxy_headers = None
+
+    def send_request(self, url_parts, headers):
+        """Sends GET request and reads the response.
+        API host requests go over the persistent connection which is reopened once if it was dropped by the server.
+        Other hosts (redirects) are requested over a one-off connection.
+        Returns response and its body or (None, None) on failure. Body checksum of 200 response is stored in `checksum`.
+
+        :param url_parts: Requested URL parts
+        :type url_parts: urllib.parse.SplitResult
+        :param headers: Request headers
+        :type headers: dict
+        """
+
+        persistent = (url_parts.scheme, url_parts.netloc) == (self.api_url_parts.scheme, self.api_url_parts.netloc)
+
+        for attempt in range(2 if persistent else 1):
+
+            if persistent:
+                connection = self.get_connection()
+                proxy_headers = self.connection_proxy_headers
+            else:
+                connection, proxy_headers = open_connection(url_parts)
+
+            try:
+                connection.request("GET", request_target(url_parts, proxy_headers is not None),
+                                   headers={**headers, **(proxy_headers or {})})
+                response = connection.getresponse()
+
+                if response.status == 200:
+                    content, self.checksum = read_response(response)
+                else:
+                    content = response.read()
+
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                if persistent:
+                    self.close_connection()
+                else:
+                    connection.close()
+                if attempt or not persistent:
+                    logger.error("Failed to fetch %s: %s", urllib.parse.urlunsplit(url_parts), e)
+                    return None, None
+
+            except (OSError, http.client.HTTPException) as e:
+                if persistent:
+                    self.close_connection()
+                else:
+                    connection.close()
+                logger.error("Failed to fetch %s: %s", urllib.parse.urlunsplit(url_parts), e)
+                return None, None
+
+            else:
+                if not persistent:
+                    connection.close()
+                return response, content
+
+        return None, None
+
     def fetch_content(self):
+        """Requests API content over the persistent connection.
+        Follows up to MAX_REDIRECTS redirects like urllib, including other hosts and schemes.
+        Authorization is only sent to the API host (scheme upgrade to HTTPS included) and never to other hosts.
+        Sends validators stored in local Meta so unchanged content is answered with 304.
+        Returns raw response body or NOT_MODIFIED. Response body checksum is stored in `checksum`.
+        """
 
-        req = urllib.request.Request(self.api_url)
-        req.add_header("Authorization", f"Token {self.api_token}")
+        headers = dict(self.api_headers)
+        if self.meta_file_content:
+            if self.meta_file_content.get('etag'):
+                headers["If-None-Match"] = self.meta_file_content['etag']
+            if self.meta_file_content.get('last_modified'):
+                headers["If-Modified-Since"] = self.meta_file_content['last_modified']
 
-        try:
-            response = urllib.request.urlopen(req, timeout=20)
+        url = self.api_url
 
-        except urllib.error.HTTPError as e:
-            logger.error(f"HTTP Error {e.code} at {self.api_url}")
-            return None
+        for _ in range(MAX_REDIRECTS + 1):
 
-        except urllib.error.URLError as e:
-            logger.error(f"Failed to fetch {self.api_url}: {e.reason}")
-            return None
+            url_parts = urllib.parse.urlsplit(url)
+            response, content = self.send_request(url_parts, headers)
 
-        else:
-            return response
+            if response is None:
+                return None
+
+            if response.status in REDIRECT_CODES:
+                location = response.getheader("Location")
+                if not location:
+                    logger.error("HTTP Error %s without Location at %s", response.status, url)
+                    return None
+
+                url = urllib.parse.urljoin(url, location)
+                redirect_parts = urllib.parse.urlsplit(url)
+
+                if redirect_parts.scheme not in ('http', 'https'):
+                    logger.error("Redirect to %s is not followed: unsupported scheme", url)
+                    return None
+
+                if redirect_parts.hostname != self.api_url_parts.hostname:
+                    headers.pop("Authorization", None)
+
+                logger.debug("Following redirect to %s", url)
+                continue
+
+            if response.status == 304:
+                return NOT_MODIFIED
 
-    def validate_api_response(self, response) -> bool:
+            if response.status != 200:
+                logger.error("HTTP Error %s at %s", response.status, url)
+                return None
+
+            self.etag = response.getheader("ETag")
+            self.last_modified = response.getheader("Last-Modified")
+            return content
+
+        logger.error("Too many redirects fetching %s", self.api_url)
+        return None
+
+    def validate_api_response(self, content) -> bool:
         """Validate API response.
         Checks required data related to theme and stories (if any).
+        Snapshot checksum is the one calculated over the raw response body while fetching.
 
-        :param response: urllib.response instance
-        :type response: object
+        :param content: Raw API response body
+        :type content: bytearray
         """
 
-        theme_required_fields = ('homepage_url', 'stories', 'error_page', 'entity', 'title',)
-        story_required_fields = ('canonical_url', 'content', 'anchor', 'updated_at', 'title',
-                                 'is_landing', 'hash', 'uid', 'credits',)
-
-        if response and response.code == 200:
+        if content:
 
             try:
-                self.remote_data = json.load(response)
-                response_dump = json.dumps(self.remote_data, sort_keys=True)
+                self.remote_data = json.loads(content)
+                self.story_dictonary = {}
 
-                if self.remote_data:
+                if not isinstance(self.remote_data, dict):
+                    logger.error("Invalid Response: JSON object expected in %s...",
+                                 content[0:128].decode('utf-8', 'replace'))
+                    return False
+
+                if missing_fields := THEME_REQUIRED_FIELDS.difference(self.remote_data):
+                    logger.error("Invalid Response: unable to find `%s` in %s...",
+                                 ', '.join(sorted(missing_fields)), content[0:128].decode('utf-8', 'replace'))
+                    return False
+
+                if not isinstance(self.remote_data['stories'], list):
+                    logger.error("Invalid Response: `stories` list expected")
+                    return False
 
-                    for theme_field in theme_required_fields:
-                        if theme_field not in self.remote_data:
-                            logger.error(f"Invalid Response: unable to find `{theme_field}` in {response_dump[0:128]}...")
+                if len(self.remote_data['stories']) > 0:
+                    for story in self.remote_data['stories']:
+                        if not isinstance(story, dict):
+                            logger.error("Invalid Story: JSON object expected in %.128s...", story)
                             return False
 
-                    if len(self.remote_data['stories']) > 0:
-                        for story in self.remote_data['stories']:
-                            for story_field in story_required_fields:
-                                if story_field not in story:
-                                    story_dump = json.dumps(story)[0:128]
-                                    logger.error(f"Invalid Story: unable to find `{story_field}` in {story_dump}...")
-                                    return False
+                        if missing_fields := STORY_REQUIRED_FIELDS.difference(story):
+                            logger.error("Invalid Story: unable to find `%s` in %.128s...",
+                                         ', '.join(sorted(missing_fields)), story)
+                            return False
 
-                            self.story_dictonary[story['anchor']] = story
-                    else:
-                        logger.warning("No Stories recieved. Cleaning instance content")
+                        self.story_dictonary[story['anchor']] = story
+                else:
+                    logger.warning("No Stories recieved. Cleaning instance content")
 
                 self.meta_object = {
-                    "checksum": hashlib.sha256(response_dump.encode("utf-8")).hexdigest(),
+                    "checksum": self.checksum,
                     "title": self.remote_data['title'],
                     "entity": self.remote_data['entity'],
                     "homepage_url": self.remote_data['homepage_url'],
                     "updated_at": str(dt.datetime.now(dt.timezone.utc)),
+                    "etag": self.etag,
+                    "last_modified": self.last_modified,
                 }
 
                 logger.debug("Valid API response")
                 return True
 
-            except json.JSONDecodeError:
+            except ValueError:
                 logger.error("Bad API Response - JSON expected")
                 return False
 
         else:
 
-            logger.error(f"Bad API response code: {response.code}")
+            logger.error("Empty API response")
             return False
 
     def clean_local_storage(self):
         """Runs through files in www dir and checks it against meta config and API response.
-        Unknown files are being deleted.
+        Unknown files are being deleted. Sitemap and Error page are kept until replaced.
         Removed stories (included into meta while not present in API) - are moved Bin 
-        Updated stories (hashes do not match in meta and API) - are move to Bin
+        Updated stories (hashes do not match in meta and API) - are hardlinked into Bin and stay in place until rewritten
+        Returns names of files left in www dir.
         """
 
         logger.info("Cleaning local storage")
 
-        for file in os.listdir(self.www_path):
+        meta_stories = (self.meta_file_content or {}).get('stories') or {}
+        story_dictonary = self.story_dictonary
+        bin_path = self.bin_path
 
-            file_path = os.path.join(self.www_path, file)
+        dir_files = {entry.name: entry.path for entry in os.scandir(self.www_path) if entry.is_file()}
 
-            if self.meta_file_content and 'stories' in self.meta_file_content and \
-                    self.meta_file_content['stories'] and file in self.meta_file_content['stories']:
+        removed = meta_stories.keys() - story_dictonary.keys()
+        updated = {anchor for anchor, story in story_dictonary.items()
+                   if (meta_story := meta_stories.get(anchor)) is not None and story['hash'] != meta_story['hash']}
+        unknown = dir_files.keys() - meta_stories.keys() - {SITEMAP_FILE_NAME, ERROR_PAGE_FILE_NAME}
 
-                if self.bin_path:
+        local_files = dir_files.keys() - unknown
 
-                    file_bin_path = os.path.join(self.bin_path, f"{file}")
+        for file in unknown:
+            file_path = dir_files[file]
+            logger.warning("Removing file %s", file_path)
+            os.remove(file_path)
 
-                    if file in self.story_dictonary:
+        if bin_path:
 
-                        if self.story_dictonary[file]['hash'] != self.meta_file_content['stories'][file]['hash']:
-                            logger.warning(f"Updating page {file}. Moving old version into Bin > {file_bin_path}")
-                            os.rename(file_path, file_bin_path)
+            for file in removed | updated:
 
-                    else:
+                file_path = dir_files.get(file)
+                if file_path is None:
+                    logger.warning("Page %s is missing in local storage", file)
+                    continue
 
-                        logger.warning(f"Page {file} was removed. Moving file into Bin > {file_bin_path}")
-                        os.rename(file_path, file_bin_path)
+                file_bin_path = os.path.join(bin_path, file)
 
-            else:
-                logger.warning(f"Removing file {file_path}")
-                os.remove(file_path)
+                if file in updated:
+                    logger.warning("Updating page %s. Keeping old version in Bin > %s", file, file_bin_path)
+                    snapshot_file(file_path, file_bin_path)
+                else:
+                    logger.warning("Page %s was removed. Moving file into Bin > %s", file, file_bin_path)
+                    os.rename(file_path, file_bin_path)
+                    local_files.discard(file)
+
+        return local_files
+
+    def save_story(self, story):
+        """Saves story content into WWW_DIR file named with the `anchor` field value.
+
+        :param story: Story data from API response
+        :type story: dict
+        """
+
+        logger.info("Saving story: %s", story['anchor'])
+        replace_file(os.path.join(self.www_path, story['anchor']), story['content'].encode("utf-8"))
 
     def sync_stories(self):
         """Sync local content with remote data.
         Creates local files in WWW_DIR named with the `anchor` field value of the story.
+        Stories with the same hash as in local Meta are not rewritten.
         Updates instance Meta data.
         Generates content for sitemap.xml.
         """
 
-        self.clean_local_storage()
+        local_files = self.clean_local_storage()
+
+        meta_stories = (self.meta_file_content or {}).get('stories') or {}
+
+        changed_stories = []
+        for story in self.story_dictonary.values():
+            if meta_stories.get(story['anchor'], {}).get('hash') == story['hash'] and story['anchor'] in local_files:
+                logger.debug("Story is up to date: %s", story['anchor'])
+            else:
+                changed_stories.append(story)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=STORY_WRITE_WORKERS) as executor:
+            for _ in executor.map(self.save_story, changed_stories):
+                pass
 
         self.meta_object['stories'] = {}
 
-        sitemap_items = ''
+        sitemap_items = []
 
         for story in self.remote_data['stories']:
 
-            logger.info(f"Saving story: {story['anchor']}")
-            with open(f"{self.www_path}/{story['anchor']}", "w") as story_file:
-                story_file.write(story['content'])
-
             self.meta_object['stories'][story['anchor']] = {
                 'anchor': story['anchor'],
                 'hash': story['hash'],
@@ -327,27 +645,34 @@ class NRTKSync(object):
                 'updated_at': story['updated_at'],
             }
 
-            sitemap_items += self.create_sitemap_item(url=story['canonical_url'],
-                                                      updated_at=story['updated_at'],
-                                                      priority=1 if 'index' == story['anchor'] else 0.8)
+            sitemap_items.append(create_sitemap_item(url=story['canonical_url'],
+                                                     updated_at=story['updated_at'],
+                                                     priority=1 if 'index' == story['anchor'] else 0.8))
 
-        self.build_sitemap(sitemap_items)
+        self.build_sitemap("".join(sitemap_items))
 
     def sync(self) -> bool:
         """Sync website remote content."""
 
         logger.debug("Content Sync")
 
-        api_response = self.fetch_content()
+        self.bin_path = None
+
+        api_content = self.fetch_content()
+
+        if api_content is NOT_MODIFIED:
+            logger.debug("Content is not modified")
+            logger.info("Update Complete")
+            return False
 
-        if api_response and self.validate_api_response(api_response):
+        if api_content and self.validate_api_response(api_content):
 
             if not self.meta_file_content or 'checksum' not in self.meta_file_content or \
                     self.meta_file_content['checksum'] != self.meta_object['checksum']:
-                logging.debug(f"Content update detected [{self.meta_object['checksum']}]. Sync stories")
+                logger.debug("Content update detected [%s]. Sync stories", self.meta_object['checksum'])
 
                 if self.meta_file_content and 'checksum' in self.meta_file_content:
-                    logger.info(f"Creating Snapshot {self.meta_file_content['checksum']}")
+                    logger.info("Creating Snapshot %s", self.meta_file_content['checksum'])
                     self.bin_path = os.path.join(self.bin_root_path, self.meta_file_content['checksum'])
                     check_dir(self.bin_path)
 
@@ -356,12 +681,20 @@ class NRTKSync(object):
                 self.save_meta()
 
             else:
-                logging.debug("Content is up to date")
+                logger.debug("Content is up to date")
 
-            logging.info("Update Complete")
+                if self.meta_file_content.get('etag') != self.etag or \
+                        self.meta_file_content.get('last_modified') != self.last_modified:
+                    self.meta_object = {**self.meta_file_content, "etag": self.etag, "last_modified": self.last_modified}
+                    self.save_meta()
+
+            self.remote_data = None
+            self.story_dictonary = {}
+
+            logger.info("Update Complete")
             return False
 
-        logging.warning("Update Unsuccessful")
+        logger.warning("Update Unsuccessful")
         return False
 
 
@@ -399,13 +732,14 @@ if __name__ == "__main__":
 
     if infinity_timer and infinity_timer >= MIN_SYNC_CYCLE:  # Check Infinity Mode ignoring short cycles
 
-        logger.info(f"Infinity Mode ({infinity_timer} seconds)")
+        logger.info("Infinity Mode (%s seconds)", infinity_timer)
+
+        next_sync_time = time.monotonic()
 
-        while True:
-            sync.meta_file_content = sync.read_meta()
+        while True:  # Cycles start on a fixed schedule; cycles missed by a long sync are skipped
+            next_sync_time = max(next_sync_time + infinity_timer, time.monotonic())
             sync.sync()
-            time.sleep(infinity_timer)
+            time.sleep(max(0, next_sync_time - time.monotonic()))
 
     else:
-        sync.meta_file_content = sync.read_meta()
         sync.sync()